@@ -1,71 +1,135 @@
-# This program is free software: you can redistribute it and/or modify
-# it under the terms of the GNU General Public License as published by
-# the Free Software Foundation, either version 3 of the License, or
-# (at your option) any later version.
-#
-# This program is distributed in the hope that it will be useful,
-# but WITHOUT ANY WARRANTY; without even the implied warranty of
-# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
-# GNU General Public License for more details.
-#
-# You should have received a copy of the GNU General Public License
-# along with this program. If not, see <https://www.gnu.org/licenses/>.
-#
-# Copyright (c) [2025] [Roman Tenger]
-import re
-import sys
-import logging
-import os
-import argparse
-
-# Get the directory where the script is located
-script_dir = os.path.dirname(os.path.abspath(__file__))
-# Configure logging to save in the script's directory
-log_file_path = os.path.join(script_dir, "log/z_shift_log.txt")
-gcode_file_path = os.path.join(script_dir, "log/modified.gcode")
-logging.basicConfig(
-    filename=log_file_path,
-    filemode="w",
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s"
-)
-
-# Main execution
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Post-process G-code for Z-shifting and extrusion adjustments.")
-    parser.add_argument("input_file", help="Path to the input G-code file")
-
-     # Factors that affect interpretation of input gcode 
-    parser.add_argument("-manufacturer", type=str, default="general", help="General/BBL") # e.g. BBL-X1C
-    parser.add_argument("-modification", type=str, default="bricklayers", help="What to do") # e.g. bricklayers
-
-    parser.add_argument("-layerHeight", type=float, default=0.2, help="Layer height in mm (default: 0.2mm)")
-    parser.add_argument("-extrusionMultiplier", type=float, default=1, help="Extrusion multiplier for first layer (default: 1.5x)")
-    args = parser.parse_args()
-
-    logging.info("------------Starting G-code post-processing-------------")
-    logging.info(f"Input file: {args.input_file}")
-    logging.info(f"Printer Manufacturer: {args.manufacturer}")
-    logging.info(f"Post-processing type: {args.modification}")
-
-    if args.manufacturer == "BBL": 
-        from modules.parsing.process_bbl_gcode import ProcessGcodeBBL
-        ProcessGcodeBBL(
-            input_file=args.input_file,
-            output_file=gcode_file_path, 
-            mod=args.modification, 
-            layer_height=args.layerHeight,
-            extrusion_multiplier=args.extrusionMultiplier,
-        )
-    else: 
-        from modules.parsing.process_gcode import ProcessGcode
-        ProcessGcode(
-            input_file=args.input_file,
-            output_file=gcode_file_path, 
-            mod=args.modification, 
-            layer_height=args.layerHeight,
-            extrusion_multiplier=args.extrusionMultiplier,
-        )
-
-    logging.info("-----G-code processing completed ---------------------------------")
-    logging.info(f"Log file saved at {log_file_path}")
\ No newline at end of file
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright (c) [2025] [Roman Tenger]
+import re
+import sys
+import logging
+import os
+import argparse
+import atexit
+from logging.handlers import MemoryHandler
+from pathlib import Path
+
+# Get the directory where the script is located
+script_dir = Path(__file__).resolve().parent
+log_file_path = script_dir / "log" / "z_shift_log.txt"
+gcode_file_path = script_dir / "log" / "modified.gcode"
+
+def _load_bbl():
+    from modules.parsing.process_bbl_gcode import ProcessGcodeBBL
+    return ProcessGcodeBBL
+
+def _load_general():
+    from modules.parsing.process_gcode import ProcessGcode
+    return ProcessGcode
+
+# Lazy dispatch table so only the selected backend is imported
+MANUFACTURERS = {
+    "BBL": _load_bbl,
+    "general": _load_general,
+}
+
+def process_one_file(input_file, output_file, manufacturer, modification, layer_height, extrusion_multiplier):
+    """Run the selected backend on a single G-code file (pool-friendly)"""
+    process_gcode = MANUFACTURERS.get(manufacturer, MANUFACTURERS["general"])()
+    process_gcode(
+        input_file=input_file,
+        output_file=output_file,
+        mod=modification,
+        layer_height=layer_height,
+        extrusion_multiplier=extrusion_multiplier,
+    )
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Post-process G-code for Z-shifting and extrusion adjustments.")
+    parser.add_argument("input_file", nargs='*', help="Path to the input G-code file(s)")
+    parser.add_argument("--daemon", action="store_true", help="Read input file paths from stdin, one per line")
+
+     # Factors that affect interpretation of input gcode 
+    parser.add_argument("-manufacturer", type=str, default="general", help="General/BBL") # e.g. BBL-X1C
+    parser.add_argument("-modification", type=str, default="bricklayers", help="What to do") # e.g. bricklayers
+
+    parser.add_argument("-layerHeight", type=float, default=0.2, help="Layer height in mm (default: 0.2mm)")
+    parser.add_argument("-extrusionMultiplier", type=float, default=1, help="Extrusion multiplier for first layer (default: 1.5x)")
+    parser.add_argument("-j", type=int, default=None, help="Worker processes for multiple input files (default: CPU count)")
+    args = parser.parse_args()
+
+    if not args.daemon and not args.input_file:
+        parser.error("input_file is required unless --daemon is given")
+
+    # Configure logging only after argument parsing so --help and bad
+    # arguments exit without touching (and truncating) the log file.
+    # Records buffer in memory and hit the file in one flush on exit
+    # instead of one write() per log line.
+    log_file_path.parent.mkdir(exist_ok=True)
+    file_handler = logging.FileHandler(str(log_file_path), mode="w")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    memory_handler = MemoryHandler(2048, flushLevel=logging.ERROR, target=file_handler)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(memory_handler)
+    atexit.register(memory_handler.flush)
+
+    logging.info("------------Starting G-code post-processing-------------")
+    logging.info("Input file: %s", args.input_file)
+    logging.info("Printer Manufacturer: %s", args.manufacturer)
+    logging.info("Post-processing type: %s", args.modification)
+
+    if args.daemon:
+        # Keep the interpreter and the selected backend resident and
+        # take file paths from stdin, so a slicer pipeline can pipe
+        # filenames instead of paying Python startup per file
+        for raw_line in sys.stdin:
+            path = raw_line.strip()
+            if not path:
+                continue
+            process_one_file(
+                path,
+                gcode_file_path,
+                args.manufacturer,
+                args.modification,
+                args.layerHeight,
+                args.extrusionMultiplier,
+            )
+    elif len(args.input_file) == 1:
+        process_one_file(
+            args.input_file[0],
+            gcode_file_path,
+            args.manufacturer,
+            args.modification,
+            args.layerHeight,
+            args.extrusionMultiplier,
+        )
+    else:
+        # Each file is independent, so fan out across worker processes.
+        # Every input gets its own debug copy under log/.
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+        output_files = [
+            gcode_file_path.with_name(f"modified_{Path(f).stem}.gcode")
+            for f in args.input_file
+        ]
+        worker = partial(
+            process_one_file,
+            manufacturer=args.manufacturer,
+            modification=args.modification,
+            layer_height=args.layerHeight,
+            extrusion_multiplier=args.extrusionMultiplier,
+        )
+        with ProcessPoolExecutor(max_workers=args.j or os.cpu_count()) as pool:
+            list(pool.map(worker, args.input_file, output_files))
+
+    logging.info("-----G-code processing completed ---------------------------------")
+    logging.info("Log file saved at %s", log_file_path)
\ No newline at end of file
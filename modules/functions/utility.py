@@ -1,19 +1,177 @@
+import mmap
 import re
+from functools import lru_cache
+from itertools import chain
+from typing import AnyStr, Iterable, Iterator, Optional, Tuple, Union
 
-def get_layer_height(gcode_lines):
-    """Extract layer height from G-code header comments"""
-    for line in gcode_lines:
-        if "; layer_height =" in line.lower():
-            match = re.search(r'layer_height = (\d*\.?\d+)', line, re.IGNORECASE)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@lru_cache(maxsize=64)
+def _compile(pattern: Union[str, bytes], flags: int = 0) -> 're.Pattern':
+    """Compile a pattern exactly once per process
+
+    Use this for any header-field extractor added to this module so a
+    pattern inlined in a loop never falls out of re's own bounded cache.
+    """
+    return re.compile(pattern, flags)
+
+# Precompiled header patterns, hoisted out of the per-line loops
+_LAYER_HEIGHT_RE = _compile(r'layer_height\s*=\s*(\d*\.?\d+)')
+_LAYER_NUMBER_RE = _compile(r'total layer number:\s*(\d+)')
+
+# Bytes variants for the zero-copy mmap path
+_LAYER_HEIGHT_RE_B = _compile(rb'layer_height\s*=\s*(\d*\.?\d+)')
+_LAYER_NUMBER_RE_B = _compile(rb'total layer number:\s*(\d+)')
+
+# Combined pattern: one scan of the header blob finds both fields
+_HEADER_RE_B = _compile(rb'layer_height\s*=\s*(\d*\.?\d+)|total layer number:\s*(\d+)')
+
+# Slicer headers comfortably fit in the first 64 KiB of the file
+_HEADER_BYTES = 65536
+
+# Upper bound on header size in lines for the NumPy-assisted slice
+_HEADER_LINES = 2000
+
+def _header_slice(mm: mmap.mmap) -> bytes:
+    """Return the raw header bytes of a memory-mapped G-code file
+
+    With NumPy available, newline offsets are located with a vectorized
+    byte compare so the slice covers exactly the first _HEADER_LINES
+    lines; otherwise fall back to a fixed _HEADER_BYTES prefix.
+    """
+    if np is not None:
+        buf = np.frombuffer(mm, dtype=np.uint8)
+        newlines = np.where(buf == 0x0A)[0]
+        if len(newlines) >= _HEADER_LINES:
+            return mm[:int(newlines[_HEADER_LINES - 1]) + 1]
+        return mm[:]
+    return mm[:_HEADER_BYTES]
+
+def parse_header_mmap(path: str) -> Tuple[Optional[float], Optional[int]]:
+    """Extract layer height and total layer number from a file by path
+
+    Memory-maps the file and searches the raw header bytes directly, so
+    no per-line str objects are allocated and nothing is decoded except
+    the two matched groups.
+    """
+    layer_height = None
+    layer_number = None
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header = _header_slice(mm)
+    for match in _HEADER_RE_B.finditer(header):
+        if match.group(1):
+            if layer_height is None:
+                layer_height = float(match.group(1))
+        elif layer_number is None:
+            layer_number = int(match.group(2))
+        if layer_height is not None and layer_number is not None:
+            break
+    return layer_height, layer_number
+
+def _sniff_bytes(gcode_iter: Iterable[AnyStr]) -> Tuple[bool, Iterator[AnyStr]]:
+    """Peek at the first line to pick str or bytes handling
+
+    Returns (is_bytes, rechained_iterator). Lets the extractors work on
+    files opened in binary mode without decoding a single line.
+    """
+    it = iter(gcode_iter)
+    first = next(it, None)
+    if first is None:
+        return False, it
+    return isinstance(first, bytes), chain((first,), it)
+
+def parse_header(gcode_iter: Iterable[AnyStr]) -> Tuple[Optional[float], Optional[int]]:
+    """Extract layer height and total layer number in a single pass
+
+    Accepts any iterable of str or bytes, including an open file object
+    (text or binary mode), so the whole file never has to be read into
+    memory or decoded just for the header.
+    """
+    is_bytes, gcode_iter = _sniff_bytes(gcode_iter)
+    if is_bytes:
+        height_needle, number_needle = b"layer_height", b"total layer number:"
+        height_re, number_re, comment = _LAYER_HEIGHT_RE_B, _LAYER_NUMBER_RE_B, b';'
+    else:
+        height_needle, number_needle = "layer_height", "total layer number:"
+        height_re, number_re, comment = _LAYER_HEIGHT_RE, _LAYER_NUMBER_RE, ';'
+    layer_height = None
+    layer_number = None
+    for line in gcode_iter:
+        if layer_height is None and height_needle in line:
+            match = height_re.search(line)
+            if match:
+                layer_height = float(match.group(1))
+        elif layer_number is None and number_needle in line:
+            match = number_re.search(line)
             if match:
-                return float(match.group(1))
+                layer_number = int(match.group(1))
+        elif line.strip() and not line.startswith(comment):
+            break
+        if layer_height is not None and layer_number is not None:
+            break
+    return layer_height, layer_number
+
+def get_layer_height(gcode_iter: Iterable[AnyStr]) -> Optional[float]:
+    """Extract layer height from G-code header comments
+
+    Accepts any iterable of str or bytes, including an open file object;
+    only the leading comment block is consumed.
+    """
+    is_bytes, gcode_iter = _sniff_bytes(gcode_iter)
+    needle = b"layer_height" if is_bytes else "layer_height"
+    prefix = b"; layer_height" if is_bytes else "; layer_height"
+    sep = b"=" if is_bytes else "="
+    pattern = _LAYER_HEIGHT_RE_B if is_bytes else _LAYER_HEIGHT_RE
+    comment = b';' if is_bytes else ';'
+    for line in gcode_iter:
+        # Cheap substring test first; only matching lines hit the regex
+        if needle not in line:
+            # Header metadata lives in the leading comment block; stop
+            # scanning once real G-code starts
+            if line.strip() and not line.startswith(comment):
+                break
+            continue
+        # Fast path for the fixed '; layer_height = 0.2' form; no regex
+        if line.startswith(prefix):
+            _, found, rhs = line.partition(sep)
+            if found:
+                try:
+                    return float(rhs.split()[0])
+                except (ValueError, IndexError):
+                    pass
+        match = pattern.search(line)
+        if match:
+            return float(match.group(1))
     return None
 
-def get_layer_number(gcode_lines):
-    """Extract layer height from G-code header comments"""
-    for line in gcode_lines:
-        if "; total layer number: " in line.lower():
-            match = re.search(r'total layer number: (\d*\.?\d+)', line, re.IGNORECASE)
-            if match:
-                return int(match.group(1))
-    return None
\ No newline at end of file
+def get_layer_number(gcode_iter: Iterable[AnyStr]) -> Optional[int]:
+    """Extract layer number from G-code header comments
+
+    Accepts any iterable of str or bytes, including an open file object;
+    only the leading comment block is consumed.
+    """
+    is_bytes, gcode_iter = _sniff_bytes(gcode_iter)
+    needle = b"total layer number:" if is_bytes else "total layer number:"
+    sep = b":" if is_bytes else ":"
+    pattern = _LAYER_NUMBER_RE_B if is_bytes else _LAYER_NUMBER_RE
+    comment = b';' if is_bytes else ';'
+    for line in gcode_iter:
+        if needle not in line:
+            if line.strip() and not line.startswith(comment):
+                break
+            continue
+        # Fast path for the fixed '; total layer number: 327' form
+        _, found, rhs = line.partition(sep)
+        if found:
+            try:
+                return int(rhs.split()[0])
+            except (ValueError, IndexError):
+                pass
+        match = pattern.search(line)
+        if match:
+            return int(match.group(1))
+    return None
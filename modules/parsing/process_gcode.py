@@ -1,97 +1,202 @@
 import logging
+import mmap
+import os
 import re
+from functools import lru_cache
 
-def ProcessGcode(input_file, output_file, mod, layer_height, extrusion_multiplier):
+log = logging.getLogger(__name__)
+
+# Precompiled per-line patterns, hoisted out of the processing loop.
+# G-code is ASCII, so the parser works on bytes and skips the text-mode
+# decode/encode passes entirely
+# All four G1 fields captured in a single scan of the line
+_G1_RE = re.compile(rb'^G1(?:\s+X([-\d.]+))?(?:\s+Y([-\d.]+))?(?:\s+E([-\d.]+))?(?:\s+F([-\d.]+))?')
+
+def _count_z_lines(path):
+    """Count G1 Z layer-change lines with a C-level byte search"""
+    if os.path.getsize(path) == 0:
+        return 0
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # A line at offset 0 has no leading newline to match
+            count = int(mm[:4] == b"G1 Z")
+            pos = mm.find(b"\nG1 Z")
+            while pos != -1:
+                count += 1
+                pos = mm.find(b"\nG1 Z", pos + 1)
+            return count
+
+@lru_cache(maxsize=8192)
+def _fmt_e(v):
+    """Format an E value, memoized per distinct float
+
+    Constant-width extrusion makes the same scaled E value recur
+    thousands of times in one file, so the second and later occurrences
+    become a dict hit instead of a float-to-string conversion.
+    """
+    return b"%.5f" % v
+
+def _parse_g1(line):
+    """Extract G1 fields in one pass
+
+    Returns (x, y, e, f, match) with floats-or-None for the fields; the
+    match object carries the group offsets so the E value can be spliced
+    in place without a second scan.
+    """
+    m = _G1_RE.match(line)
+    if not m:
+        return None
+    x, y, e, f = m.groups()
+    return (float(x) if x else None, float(y) if y else None,
+            float(e) if e else None, float(f) if f else None, m)
+
+def _modified_lines(lines, total_layers, z_shift, layer_height, extrusion_multiplier):
+    """Yield the modified G-code for an iterable of input lines"""
     current_layer = 0
     current_z = 0.0
     perimeter_type = None
     perimeter_block_count = 0
     inside_perimeter_block = False
-    z_shift = layer_height * 0.5
-    logging.info(f"Z-shift: {z_shift} mm, Layer height: {layer_height} mm")
-
-    # Read the input G-code
-    with open(input_file, 'r') as infile:
-        lines = infile.readlines()
+    e_scale = 1.0  # Per-block E multiplier; 1.0 passes lines through untouched
+    e_tag = b""
+    # Adjusted extrude lines of the current scaled block; the whole run
+    # is joined and yielded as one bytes object so a block costs one
+    # buffer append instead of one per line
+    pending = []
 
-    # Identify the total number of layers by looking for `G1 Z` commands
-    total_layers = sum(1 for line in lines if line.startswith("G1 Z"))
-
-    # Process the G-code
-    modified_lines = []
     for line in lines:
+        # First-character dispatch: most lines are plain moves, so decide
+        # up front whether the comment or G-command tests can apply at all
+        c0 = line[:1]
+
         # Detect layer changes
-        if line.startswith("G1 Z"):
-            z_match = re.search(r'Z([-\d.]+)', line)
-            if z_match:
-                current_z = float(z_match.group(1))
+        if c0 == b'G' and line.startswith(b"G1 Z"):
+            # 'G1 Z<float>' with an optional feedrate or comment tail:
+            # slice past the prefix and cut at the first space instead of
+            # running a regex for one float
+            tok = line[4:]
+            end = tok.find(b' ')
+            try:
+                current_z = float(tok[:end] if end >= 0 else tok)
+            except ValueError:
+                pass  # Malformed Z token - keep the previous layer state
+            else:
                 current_layer = int(current_z / layer_height)
 
                 perimeter_block_count = 0  # Reset block counter for new layer
-                logging.info(f"Layer {current_layer} detected at Z={current_z:.3f}")
-            modified_lines.append(line)
+                log.info("Layer %d detected at Z=%.3f", current_layer, current_z)
+            if pending:
+                yield b"".join(pending)
+                pending.clear()
+            yield line
             continue
 
         # Detect perimeter types from PrusaSlicer comments
-        if ";TYPE:External perimeter" in line or ";TYPE:Outer wall" in line:
+        if c0 != b';':
+            pass
+        elif line.startswith((b";TYPE:External perimeter", b";TYPE:Outer wall")):
             perimeter_type = "external"
             inside_perimeter_block = False
-            logging.info(f"External perimeter detected at layer {current_layer}")
-        elif ";TYPE:Perimeter" in line or ";TYPE:Inner wall" in line:
+            log.info("External perimeter detected at layer %d", current_layer)
+        elif line.startswith((b";TYPE:Perimeter", b";TYPE:Inner wall")):
             perimeter_type = "internal"
             inside_perimeter_block = False
-            logging.info(f"Internal perimeter block started at layer {current_layer}")
-        elif ";TYPE:" in line:  # Reset for other types
+            log.info("Internal perimeter block started at layer %d", current_layer)
+        elif line.startswith(b";TYPE:"):  # Reset for other types
             perimeter_type = None
             inside_perimeter_block = False
 
+        # Tokenize candidate G1 lines once; the field tuple replaces the
+        # per-substring scans for X/Y/E/F
+        g = _parse_g1(line) if c0 == b'G' and perimeter_type == "internal" and line.startswith(b"G1") else None
+        g1xy = g is not None and g[0] is not None and g[1] is not None
+
         # Group lines into perimeter blocks
-        if perimeter_type == "internal" and line.startswith("G1") and "X" in line and "Y" in line and "E" in line:
+        if g1xy and g[2] is not None:
             # Start a new perimeter block if not already inside one
             if not inside_perimeter_block:
                 perimeter_block_count += 1
                 inside_perimeter_block = True
-                logging.info(f"Perimeter block #{perimeter_block_count} detected at layer {current_layer}")
+                log.info("Perimeter block #%d detected at layer %d", perimeter_block_count, current_layer)
 
                 # Insert the corresponding Z height for this block
-                is_shifted = False  # Flag for whether this block is Z-shifted
-                if perimeter_block_count % 2 == 1:  # Apply Z-shift to odd-numbered blocks
+                is_shifted = perimeter_block_count % 2 == 1  # Apply Z-shift to odd-numbered blocks
+                if is_shifted:
                     adjusted_z = current_z + z_shift
-                    logging.info(f"Inserting G1 Z{adjusted_z:.3f} for shifted perimeter block #{perimeter_block_count}")
-                    modified_lines.append(f"G1 Z{adjusted_z:.3f} ; Shifted Z for block #{perimeter_block_count}\n")
-                    is_shifted = True
+                    log.info("Inserting G1 Z%.3f for shifted perimeter block #%d", adjusted_z, perimeter_block_count)
+                    yield b"G1 Z%.3f ; Shifted Z for block #%d\n" % (adjusted_z, perimeter_block_count)
                 else:  # Reset to the true layer height for even-numbered blocks
-                    logging.info(f"Inserting G1 Z{current_z:.3f} for non-shifted perimeter block #{perimeter_block_count}")
-                    modified_lines.append(f"G1 Z{current_z:.3f} ; Reset Z for block #{perimeter_block_count}\n")
-
-            # Adjust extrusion (`E` values) for shifted blocks on the first and last layer
-            if is_shifted:
-                e_match = re.search(r'E([-\d.]+)', line)
-                if e_match:
-                    e_value = float(e_match.group(1))
-                    if current_layer == 0:  # First layer
-                        new_e_value = e_value * 1.5
-                        logging.info(f"Multiplying E value by 1.5 on first layer (shifted block): {e_value:.5f} -> {new_e_value:.5f}")
-                        line = re.sub(r'E[-\d.]+', f'E{new_e_value:.5f}', line).strip()
-                        line += f" ; Adjusted E for first layer, block #{perimeter_block_count}\n"
-                    elif current_layer == total_layers - 1:  # Last layer
-                        new_e_value = e_value * 0.5
-                        logging.info(f"Multiplying E value by 0.5 on last layer (shifted block): {e_value:.5f} -> {new_e_value:.5f}")
-                        line = re.sub(r'E[-\d.]+', f'E{new_e_value:.5f}', line).strip()
-                        line += f" ; Adjusted E for last layer, block #{perimeter_block_count}\n"
-                    else: 
-                        new_e_value = e_value * extrusion_multiplier
-                        logging.info(f"Multiplying E value by extrusionMultiplier")
-                        line = re.sub(r'E[-\d.]+', f'E{new_e_value:.5f}', line).strip()
-                        line += f" ; Adjusted E for extrusionMultiplier, block #{perimeter_block_count}\n"
+                    log.info("Inserting G1 Z%.3f for non-shifted perimeter block #%d", current_z, perimeter_block_count)
+                    yield b"G1 Z%.3f ; Reset Z for block #%d\n" % (current_z, perimeter_block_count)
+
+                # Decide the E adjustment once on block entry; every
+                # extrude line in the block reuses the factor and tag
+                if not is_shifted:
+                    e_scale = 1.0
+                elif current_layer == 0:  # First layer
+                    e_scale = 1.5
+                    e_tag = b"first layer"
+                elif current_layer == total_layers - 1:  # Last layer
+                    e_scale = 0.5
+                    e_tag = b"last layer"
+                else:
+                    e_scale = extrusion_multiplier
+                    e_tag = b"extrusionMultiplier"
+
+            # Adjust extrusion (`E` values) for shifted blocks; the common
+            # unscaled case passes the line through with no string work
+            if e_scale != 1.0:
+                e_value = g[2]
+                new_e_value = e_value * e_scale
+                log.info("Multiplying E value by %s (%s, shifted block): %.5f -> %.5f", e_scale, e_tag.decode(), e_value, new_e_value)
+                # Splice the new E value at the offsets the tokenizer
+                # already found instead of rescanning with re.sub
+                e_start, e_end = g[4].span(3)
+                # One format builds the final line; the old splice,
+                # strip and comment concat each copied the full line
+                pending.append(b"%s%s%s ; Adjusted E for %s, block #%d\n" % (
+                    line[:e_start], _fmt_e(new_e_value), line[e_end:].rstrip(),
+                    e_tag, perimeter_block_count))
+                continue
 						
-        elif perimeter_type == "internal" and line.startswith("G1") and "X" in line and "Y" in line and "F" in line:  # End of perimeter block
+        elif g1xy and g[3] is not None:  # End of perimeter block
             inside_perimeter_block = False
 
-        modified_lines.append(line)
+        if pending:
+            yield b"".join(pending)
+            pending.clear()
+        yield line
+
+    if pending:  # Input ended inside a scaled block
+        yield b"".join(pending)
+
+def ProcessGcode(input_file, output_file, mod, layer_height, extrusion_multiplier):
+    z_shift = layer_height * 0.5
+    log.info("Z-shift: %s mm, Layer height: %s mm", z_shift, layer_height)
+
+    # Identify the total number of layers by looking for `G1 Z` commands;
+    # mmap.count searches raw bytes at memory bandwidth instead of paying
+    # a Python-level startswith per line
+    total_layers = _count_z_lines(input_file)
 
-    # Overwrite the input file with the modified G-code
-    with open(input_file, 'w') as log_out:
-        log_out.writelines(modified_lines)
-    with open(output_file, 'w') as gcode_out:
-        gcode_out.writelines(modified_lines)
+    # Stream the modified G-code through to both outputs in one pass. The
+    # in-place copy goes to a temp file first so the input being read is
+    # never truncated mid-stream, then replaces it atomically.
+    tmp_name = str(input_file) + '.tmp'
+    with open(input_file, 'rb') as infile, \
+         open(tmp_name, 'wb') as tmp_out, \
+         open(output_file, 'wb') as gcode_out:
+        # Accumulate output in a contiguous bytearray and flush it to both
+        # destinations in 1 MiB chunks - no per-line write calls and no
+        # re-encoding for the second copy
+        buf = bytearray()
+        for line in _modified_lines(infile, total_layers, z_shift, layer_height, extrusion_multiplier):
+            buf += line
+            if len(buf) >= 1 << 20:
+                tmp_out.write(buf)
+                gcode_out.write(buf)
+                del buf[:]
+        if buf:
+            tmp_out.write(buf)
+            gcode_out.write(buf)
+    os.replace(tmp_name, input_file)